@@ -1,12 +1,53 @@
+import codecs
+import hashlib
+import http.client
 import os
+import queue
 import re
+import socket
 import subprocess
 import sqlite3
+import threading
+import time
+import uuid
+import orjson
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import wraps
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session, g
+from urllib.parse import quote, urlencode
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, session, g
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
+
+
+class OrjsonProvider(JSONProvider):
+    """Encode and decode JSON with orjson, which is much faster than the stdlib."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping a decode/encode
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Compress JSON responses (logs and mod lists shrink ~10x); a low level keeps CPU cost small
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/plain', 'text/html']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_BR_LEVEL'] = 4
+Compress(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'change-me-in-production')
 
 DASHBOARD_PASSWORD = os.environ.get('DASHBOARD_PASSWORD', 'admin')
@@ -14,34 +55,145 @@ COMPOSE_DIR = os.environ.get('COMPOSE_DIR', '/home/ubuntu/pz-server')
 CONTAINER_NAME = os.environ.get('CONTAINER_NAME', 'projectzomboid')
 ENV_FILE = os.path.join(COMPOSE_DIR, '.env')
 DATABASE = os.path.join(COMPOSE_DIR, 'dashboard.db')
+CGROUP_ROOT = os.environ.get('CGROUP_ROOT', '/sys/fs/cgroup')
+DOCKER_SOCKET = os.environ.get('DOCKER_SOCKET', '/var/run/docker.sock')
+
+# Deadlines for docker calls, so a hung daemon can't stall a request forever
+DOCKER_TIMEOUT = 10
+COMPOSE_TIMEOUT = 30
+
+# Workshop metadata rarely changes, collections a bit more often
+WORKSHOP_CACHE_TTL = 24 * 60 * 60
+COLLECTION_CACHE_TTL = 60 * 60
+
+# Large lookups are split into chunks fetched in parallel by a small shared pool,
+# which also bounds how many requests we have in flight against Steam
+WORKSHOP_BATCH_SIZE = 100
+steam_pool = ThreadPoolExecutor(max_workers=4)
+
+# Steam allows roughly 200 Web API calls per 5 minutes; stay under it ourselves
+STEAM_RATE_LIMIT = 200
+STEAM_RATE_WINDOW = 5 * 60
+STEAM_MAX_RETRY_AFTER = 30
+_steam_calls = deque()
+_steam_calls_lock = threading.Lock()
+
+
+class SteamRetry(Retry):
+    """Retry policy that honours Retry-After, but never waits longer than 30s.
+
+    A 429 is retried at most once, and every retry counts against the Steam rate budget.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None and response.status == 429 and any(h.status == 429 for h in self.history):
+            # Still throttled after waiting once; give up and hand back the 429
+            raise MaxRetryError(_pool, url, ResponseError('too many 429 error responses'))
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if steam_rate_limited():
+            raise MaxRetryError(_pool, url, ResponseError('Steam API rate limit reached'))
+        return retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, STEAM_MAX_RETRY_AFTER)
+
+
+# Shared HTTP session so Steam API calls reuse pooled keep-alive connections.
+# The pool blocks when full, capping open sockets during bursty imports.
+STEAM_MAX_CONNECTIONS = 16
+steam_session = requests.Session()
+steam_session.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=STEAM_MAX_CONNECTIONS,
+    pool_block=True,
+    max_retries=SteamRetry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET', 'POST'],  # Steam lookups are read-only
+        raise_on_status=False
+    )
+))
+
+
+def connect_db():
+    """Open a database connection tuned for concurrent dashboard use."""
+    # Pooled connections may be reused by a different thread than opened them
+    db = sqlite3.connect(DATABASE, check_same_thread=False)
+    # WAL (set in init_db) lets readers run alongside a writer; NORMAL syncs far less often
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.execute('PRAGMA busy_timeout=5000')
+    db.execute('PRAGMA temp_store=MEMORY')
+    db.execute('PRAGMA cache_size=-20000')
+    return db
+
+
+# Idle request connections, kept open so their page cache stays warm. LIFO hands
+# out the most recently used (hottest) connection first.
+_db_pool = queue.LifoQueue(maxsize=8)
 
 
 def get_db():
     """Get database connection for the current request."""
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        try:
+            db = _db_pool.get_nowait()
+        except queue.Empty:
+            db = connect_db()
+            db.row_factory = sqlite3.Row
+        g._database = db
     return db
 
 
 @app.teardown_appcontext
 def close_connection(exception):
-    """Close database connection at end of request."""
+    """Return the request's database connection to the pool."""
     db = getattr(g, '_database', None)
     if db is not None:
-        db.close()
+        db.rollback()  # Don't hand on a half-finished transaction
+        try:
+            _db_pool.put_nowait(db)
+        except queue.Full:
+            db.close()
 
 
 def init_db():
     """Initialize the database with required tables."""
-    db = sqlite3.connect(DATABASE)
+    db = connect_db()
+    db.execute('PRAGMA journal_mode=WAL')  # Persists in the database file
     db.execute('''
         CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
             value TEXT
         )
     ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS backup_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT,
+            output TEXT
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS steam_cache (
+            key TEXT PRIMARY KEY,
+            generated_at REAL,
+            stale_at REAL,
+            body BLOB
+        )
+    ''')
+    # Backups run on a thread in this process, so any still 'running' died with the last one
+    db.execute(
+        "UPDATE backup_jobs SET status = 'error', output = 'Interrupted by a dashboard restart' WHERE status = 'running'"
+    )
+    # Keep only the most recent jobs (INSERT OR REPLACE gives updated rows a new rowid)
+    db.execute('DELETE FROM backup_jobs WHERE rowid NOT IN (SELECT rowid FROM backup_jobs ORDER BY rowid DESC LIMIT 50)')
+    # Drop Steam entries that have been stale for over a week
+    db.execute('DELETE FROM steam_cache WHERE stale_at < ?', (time.time() - 7 * 24 * 60 * 60,))
     db.commit()
     db.close()
 
@@ -50,64 +202,133 @@ def init_db():
 init_db()
 
 
+# KEY=value lines (not comments), with whitespace around key and value trimmed
+ENV_LINE_RE = re.compile(r'^[ \t]*((?:[^#=\s][^=\n]*?)?)[ \t]*=[ \t]*(.*?)[ \t\r]*$', re.MULTILINE)
+
+# Parsed .env contents, reused until the file changes. Keyed on inode, size and
+# nanosecond mtime, so an edit within the same coarse timestamp tick is still seen.
+_env_cache = {'mtime': None, 'vars': {}, 'raw': ''}
+_env_lock = threading.RLock()
+
+
+def load_env_file():
+    """Return (vars, raw_text) for the .env file, reparsing only when it has changed."""
+    try:
+        st = os.stat(ENV_FILE)
+        mtime = (st.st_ino, st.st_size, st.st_mtime_ns)
+    except FileNotFoundError:
+        return {}, ''
+
+    with _env_lock:
+        if mtime != _env_cache['mtime']:
+            with open(ENV_FILE, 'r') as f:
+                data = f.read()
+            env_vars = dict(ENV_LINE_RE.findall(data))
+            _env_cache.update(mtime=mtime, vars=env_vars, raw=data)
+        return _env_cache['vars'], _env_cache['raw']
+
+
 def read_env_file():
     """Read the .env file and return as dict."""
-    env_vars = {}
-    if os.path.exists(ENV_FILE):
-        with open(ENV_FILE, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    env_vars[key.strip()] = value.strip()
-    return env_vars
+    env_vars, _ = load_env_file()
+    return env_vars.copy()
 
 
 def write_env_file(env_vars):
-    """Write dict back to .env file, preserving comments and order."""
-    lines = []
-    existing_keys = set()
-
-    # Read existing file to preserve comments and order
-    if os.path.exists(ENV_FILE):
-        with open(ENV_FILE, 'r') as f:
-            for line in f:
-                stripped = line.strip()
-                if stripped.startswith('#') or not stripped:
-                    lines.append(line.rstrip('\n'))
-                elif '=' in stripped:
-                    key = stripped.split('=', 1)[0].strip()
-                    existing_keys.add(key)
-                    if key in env_vars:
-                        lines.append(f'{key}={env_vars[key]}')
-                    else:
-                        lines.append(line.rstrip('\n'))
-
-    # Add new keys that weren't in the file
-    for key, value in env_vars.items():
-        if key not in existing_keys:
-            lines.append(f'{key}={value}')
-
-    with open(ENV_FILE, 'w') as f:
-        f.write('\n'.join(lines) + '\n')
+    """Set the given keys in the .env file, preserving comments, order and other keys."""
+    # Hold the cache lock across read-modify-write so concurrent updates don't interleave
+    with _env_lock:
+        _, data = load_env_file()
+
+        # Single pass over the cached text: copy everything between the
+        # assignments being changed verbatim, so comments and order survive
+        parts = []
+        existing_keys = set()
+        pos = 0
+        for match in ENV_LINE_RE.finditer(data):
+            key = match.group(1)
+            existing_keys.add(key)
+            if key in env_vars:
+                parts.append(data[pos:match.start()])
+                parts.append(f'{key}={env_vars[key]}')
+                pos = match.end()
+        parts.append(data[pos:])
+        if data and not data.endswith('\n'):
+            parts.append('\n')
+
+        # Add new keys that weren't in the file
+        for key, value in env_vars.items():
+            if key not in existing_keys:
+                parts.append(f'{key}={value}\n')
+
+        # Write to a temp file and swap it in so readers never see a partial file
+        tmp_file = f'{ENV_FILE}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write(''.join(parts))
+        try:
+            st = os.stat(ENV_FILE)
+            os.chmod(tmp_file, st.st_mode)
+            os.chown(tmp_file, st.st_uid, st.st_gid)
+        except OSError:
+            pass
+        os.replace(tmp_file, ENV_FILE)
+        _env_cache['mtime'] = None
+
+
+def sync_env_file(values):
+    """Mirror settings into .env for the PZ server, writing only if something changed."""
+    env_vars, _ = load_env_file()
+    changed = {key: value for key, value in values.items() if env_vars.get(key) != value}
+    if changed:
+        write_env_file(changed)
+
+
+def get_setting(key, default=None):
+    """Get a dashboard setting, picking up hand edits to .env (which the PZ server reads)."""
+    env_value = load_env_file()[0].get(key)
+    db = get_db()
+    row = db.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
+    stored = row['value'] if row is not None else None
+
+    if env_value is not None and env_value != stored:
+        # First read, or .env was edited since; store what the server will actually use
+        with db:
+            db.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, env_value))
+        return env_value
+    return stored if stored is not None else default
+
+
+def set_settings(values):
+    """Save settings to SQLite (primary storage) and sync them to the .env file."""
+    db = get_db()
+    # One transaction for all keys: a single commit, and nothing half-saved if one fails
+    with db:
+        db.executemany('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', values.items())
+    sync_env_file(values)
+
+
+def set_setting(key, value):
+    set_settings({key: value})
+
+
+# Matches each non-empty item of a semicolon separated list, trimmed
+LIST_ITEM_RE = re.compile(r'\s*([^;\s][^;]*?)\s*(?:;|$)')
 
 
 def get_mods():
     """Get current mod configuration from SQLite, falling back to .env."""
     db = get_db()
 
-    # Try to get from SQLite first
-    workshop_row = db.execute(
-        'SELECT value FROM settings WHERE key = ?', ('WORKSHOP_ITEMS',)
-    ).fetchone()
-    mods_row = db.execute(
-        'SELECT value FROM settings WHERE key = ?', ('MODS',)
-    ).fetchone()
+    # Try to get from SQLite first (both keys in one query)
+    rows = db.execute(
+        'SELECT key, value FROM settings WHERE key IN (?, ?)', ('WORKSHOP_ITEMS', 'MODS')
+    ).fetchall()
+    settings = {row['key']: row['value'] for row in rows}
 
     # If we have values in SQLite, use those
-    if workshop_row is not None or mods_row is not None:
-        workshop_items = workshop_row['value'] if workshop_row else ''
-        mods = mods_row['value'] if mods_row else ''
+    if settings:
+        workshop_items = settings.get('WORKSHOP_ITEMS') or ''
+        mods = settings.get('MODS') or ''
     else:
         # Fall back to .env file (for initial migration)
         env = read_env_file()
@@ -116,19 +337,15 @@ def get_mods():
 
         # Migrate to SQLite if we found values in .env
         if workshop_items or mods:
-            db.execute(
-                'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                ('WORKSHOP_ITEMS', workshop_items)
-            )
-            db.execute(
-                'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                ('MODS', mods)
-            )
-            db.commit()
+            with db:
+                db.executemany(
+                    'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                    [('WORKSHOP_ITEMS', workshop_items), ('MODS', mods)]
+                )
 
     # Parse into lists (semicolon separated)
-    workshop_list = [w.strip() for w in workshop_items.split(';') if w.strip()]
-    mod_list = [m.strip() for m in mods.split(';') if m.strip()]
+    workshop_list = LIST_ITEM_RE.findall(workshop_items)
+    mod_list = LIST_ITEM_RE.findall(mods)
 
     return {
         'workshop_items': workshop_list,
@@ -141,40 +358,134 @@ def save_mods(workshop_items, mods):
     workshop_str = ';'.join(workshop_items)
     mods_str = ';'.join(mods)
 
-    # Save to SQLite (primary storage)
-    db = get_db()
-    db.execute(
-        'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-        ('WORKSHOP_ITEMS', workshop_str)
-    )
-    db.execute(
-        'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-        ('MODS', mods_str)
-    )
-    db.commit()
+    set_settings({'WORKSHOP_ITEMS': workshop_str, 'MODS': mods_str})
 
-    # Also sync to .env file for the PZ server to read
-    env = read_env_file()
-    env['WORKSHOP_ITEMS'] = workshop_str
-    env['MODS'] = mods_str
-    write_env_file(env)
 
+def steam_rate_limited():
+    """Count a Steam API call against the shared budget; True if it is used up."""
+    now = time.monotonic()
+    with _steam_calls_lock:
+        while _steam_calls and now - _steam_calls[0] >= STEAM_RATE_WINDOW:
+            _steam_calls.popleft()
+        if len(_steam_calls) >= STEAM_RATE_LIMIT:
+            return True
+        _steam_calls.append(now)
+        return False
 
-def fetch_workshop_info(workshop_id):
-    """Fetch mod info from Steam Workshop API."""
+
+RATE_LIMITED = {'success': False, 'error': 'Steam API rate limit reached, try again in a few minutes'}
+
+
+# Idle Steam cache connections, shared by request handlers and the Steam pool threads.
+# A plain pool rather than thread-locals: under gevent those are per greenlet, which
+# would open (and leak) a connection for every request.
+_cache_db_pool = queue.LifoQueue(maxsize=4)
+
+
+@contextmanager
+def cache_db():
+    """Borrow a connection for the Steam cache (also used outside requests)."""
+    try:
+        db = _cache_db_pool.get_nowait()
+    except queue.Empty:
+        db = connect_db()
+    try:
+        yield db
+    finally:
+        db.rollback()  # Don't hand on a half-finished transaction
+        try:
+            _cache_db_pool.put_nowait(db)
+        except queue.Full:
+            db.close()
+
+
+class TTLCache:
+    """Per-ID Steam cache in SQLite that keeps the last good result past its expiry.
+
+    Living in the dashboard database, it survives restarts and is shared by all
+    gunicorn workers.
+    """
+
+    def __init__(self, prefix, seconds):
+        self.prefix = prefix
+        self.seconds = seconds
+
+    def get_many(self, keys):
+        """Return {key: (result, fresh)} for the keys that have been cached."""
+        found = {}
+        now = time.time()
+        keys = list(keys)
+        with cache_db() as db:
+            for i in range(0, len(keys), 500):
+                chunk = [f'{self.prefix}:{key}' for key in keys[i:i + 500]]
+                rows = db.execute(
+                    f'SELECT key, stale_at, body FROM steam_cache WHERE key IN ({",".join("?" * len(chunk))})',
+                    chunk
+                ).fetchall()
+                for key, stale_at, body in rows:
+                    found[key.split(':', 1)[1]] = (orjson.loads(body), now < stale_at)
+        return found
+
+    def get(self, key):
+        """Return (result, fresh) for a key, or (None, False) if never cached."""
+        return self.get_many([key]).get(key, (None, False))
+
+    def set_many(self, results):
+        now = time.time()
+        with cache_db() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO steam_cache (key, generated_at, stale_at, body) VALUES (?, ?, ?, ?)',
+                [(f'{self.prefix}:{key}', now, now + self.seconds, orjson.dumps(result)) for key, result in results.items()]
+            )
+            db.commit()
+            if len(results) > 1:
+                # Fold a bulk write back into the main file without waiting on readers
+                db.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def set(self, key, result):
+        self.set_many({key: result})
+
+
+def ttl_cache(prefix, seconds):
+    """Cache successful Steam lookups per ID, serving the stale copy if a refresh fails."""
+    def decorator(f):
+        cache = TTLCache(prefix, seconds)
+
+        @wraps(f)
+        def wrapper(key):
+            cached, fresh = cache.get(key)
+            if fresh:
+                return cached
+
+            result = f(key)
+            if result.get('success'):
+                cache.set(key, result)
+                return result
+            return dict(cached, stale=True) if cached is not None else result
+        return wrapper
+    return decorator
+
+
+_workshop_cache = TTLCache('ws', WORKSHOP_CACHE_TTL)
+
+
+def _fetch_workshop_details(workshop_ids):
+    """Fetch mod info for several Workshop IDs in a single Steam API call."""
+    if steam_rate_limited():
+        return {workshop_id: dict(RATE_LIMITED) for workshop_id in workshop_ids}
     try:
         url = "https://api.steampowered.com/ISteamRemoteStorage/GetPublishedFileDetails/v1/"
-        data = {
-            'itemcount': 1,
-            'publishedfileids[0]': workshop_id
-        }
-        response = requests.post(url, data=data, timeout=10)
+        data = {'itemcount': len(workshop_ids)}
+        for i, workshop_id in enumerate(workshop_ids):
+            data[f'publishedfileids[{i}]'] = workshop_id
+        response = steam_session.post(url, data=data, timeout=10)
+        found = {}
         if response.status_code == 200:
-            result = response.json()
-            if result.get('response', {}).get('publishedfiledetails'):
-                details = result['response']['publishedfiledetails'][0]
+            result = orjson.loads(response.content)
+            for details in result.get('response', {}).get('publishedfiledetails', []):
+                workshop_id = str(details.get('publishedfileid'))
                 if details.get('result') == 1:
-                    return {
+                    found[workshop_id] = {
                         'success': True,
                         'title': details.get('title', 'Unknown'),
                         'description': details.get('description', '')[:200],
@@ -182,22 +493,66 @@ def fetch_workshop_info(workshop_id):
                         'workshop_id': workshop_id,
                         'is_collection': details.get('creator_appid') == 0  # Collections have creator_appid=0
                     }
-        return {'success': False, 'error': 'Mod not found'}
+        return {
+            workshop_id: found.get(workshop_id, {'success': False, 'error': 'Mod not found'})
+            for workshop_id in workshop_ids
+        }
     except Exception as e:
-        return {'success': False, 'error': str(e)}
+        return {workshop_id: {'success': False, 'error': str(e)} for workshop_id in workshop_ids}
+
+
+def fetch_workshop_info_batch(workshop_ids):
+    """Fetch mod info for many Workshop IDs, only asking Steam for uncached ones."""
+    results = {}
+    stale = {}
+    missing = []
+    workshop_ids = list(dict.fromkeys(workshop_ids))
+    cached = _workshop_cache.get_many(workshop_ids)
+    for workshop_id in workshop_ids:
+        info, fresh = cached.get(workshop_id, (None, False))
+        if fresh:
+            results[workshop_id] = info
+        else:
+            missing.append(workshop_id)
+            if info is not None:
+                stale[workshop_id] = dict(info, stale=True)
+
+    chunks = [missing[i:i + WORKSHOP_BATCH_SIZE] for i in range(0, len(missing), WORKSHOP_BATCH_SIZE)]
+    if len(chunks) > 1:
+        fetched = steam_pool.map(_fetch_workshop_details, chunks)
+    else:
+        fetched = map(_fetch_workshop_details, chunks)
+
+    found = {}
+    for chunk in fetched:
+        for workshop_id, info in chunk.items():
+            if info.get('success'):
+                found[workshop_id] = info
+            results[workshop_id] = info if info.get('success') else stale.get(workshop_id, info)
+    if found:
+        _workshop_cache.set_many(found)
+    return {workshop_id: results[workshop_id] for workshop_id in workshop_ids}
+
 
+def fetch_workshop_info(workshop_id):
+    """Fetch mod info from Steam Workshop API."""
+    return fetch_workshop_info_batch([workshop_id])[workshop_id]
 
+
+@ttl_cache('collection', COLLECTION_CACHE_TTL)
 def fetch_collection_items(collection_id):
     """Fetch all items from a Steam Workshop collection."""
+    if steam_rate_limited():
+        return dict(RATE_LIMITED)
     try:
         url = "https://api.steampowered.com/ISteamRemoteStorage/GetCollectionDetails/v1/"
         data = {
             'collectioncount': 1,
             'publishedfileids[0]': collection_id
         }
-        response = requests.post(url, data=data, timeout=30)
+        response = steam_session.post(url, data=data, timeout=30)
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             if result.get('response', {}).get('collectiondetails'):
                 collection = result['response']['collectiondetails'][0]
                 if collection.get('result') == 1:
@@ -222,33 +577,151 @@ def login_required(f):
     return decorated_function
 
 
-def run_docker_command(command):
-    """Run a docker compose command and return output."""
+class DockerConnection(http.client.HTTPConnection):
+    """HTTP connection to the Docker Engine API over its unix socket."""
+
+    def __init__(self, timeout=DOCKER_TIMEOUT):
+        super().__init__('localhost', timeout=timeout)
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(DOCKER_SOCKET)
+
+
+# Idle keep-alive connections to the Docker socket. A shared pool rather than
+# thread-locals, which gevent makes per greenlet (one new socket per request).
+_docker_pool = queue.LifoQueue(maxsize=4)
+
+
+def docker_api(method, path, timeout=None):
+    """Call the Docker Engine API on a pooled keep-alive connection; returns (status, body).
+
+    Calls that may run longer than DOCKER_TIMEOUT pass their own timeout and use a
+    one-off connection.
+    """
+    if timeout is not None:
+        conn = DockerConnection(timeout=timeout)
+        try:
+            conn.request(method, path)
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    for attempt in range(2):
+        try:
+            # Retry on a fresh connection, not another possibly stale pooled one
+            conn = _docker_pool.get_nowait() if not attempt else DockerConnection()
+        except queue.Empty:
+            conn = DockerConnection()
+        try:
+            conn.request(method, path)
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError):
+            # The daemon may have closed an idle connection; reconnect once
+            conn.close()
+            if attempt:
+                raise
+            continue
+        try:
+            _docker_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        return response.status, body
+
+
+def inspect_container():
+    """Get the PZ container's details from the Docker API, or None if it doesn't exist."""
+    status, body = docker_api('GET', f'/containers/{quote(CONTAINER_NAME)}/json')
+    if status != 200:
+        return None
+    return orjson.loads(body)
+
+
+def demux_docker_logs(data):
+    """Strip the 8-byte stream headers Docker puts on non-TTY log output."""
+    chunks = []
+    i = 0
+    while i + 8 <= len(data) and data[i] in (0, 1, 2) and data[i + 1:i + 4] == b'\0\0\0':
+        size = int.from_bytes(data[i + 4:i + 8], 'big')
+        chunks.append(data[i + 8:i + 8 + size])
+        i += 8 + size
+    # Containers with a TTY send raw, unframed output
+    chunks.append(data[i:])
+    return b''.join(chunks).decode('utf-8', errors='replace')
+
+
+def run_docker(command, timeout=DOCKER_TIMEOUT, cwd=None):
+    """Run a docker CLI command, killing it if it outlives the deadline."""
     try:
-        result = subprocess.run(
+        return subprocess.run(
             command,
-            cwd=COMPOSE_DIR,
+            cwd=cwd,
             capture_output=True,
             text=True,
-            timeout=30
+            timeout=timeout
         )
+    except subprocess.TimeoutExpired:
+        return subprocess.CompletedProcess(command, -1, '', 'Command timed out')
+
+
+def run_docker_command(command):
+    """Run a docker compose command and return output."""
+    try:
+        result = run_docker(command, timeout=COMPOSE_TIMEOUT, cwd=COMPOSE_DIR)
         return {
             'success': result.returncode == 0,
             'output': result.stdout or result.stderr
         }
-    except subprocess.TimeoutExpired:
-        return {'success': False, 'output': 'Command timed out'}
     except Exception as e:
         return {'success': False, 'output': str(e)}
 
 
+def cache_for(seconds):
+    """Reuse a zero-argument helper's result briefly; concurrent callers share one run."""
+    def decorator(f):
+        state = {'t': 0.0, 'value': None}
+        lock = threading.Lock()
+
+        def is_fresh():
+            return state['value'] is not None and time.monotonic() - state['t'] < seconds
+
+        @wraps(f)
+        def wrapper():
+            # Fresh values are read without the lock; only a refresh takes it, and
+            # callers that queued behind the refresh reuse its result
+            if is_fresh():
+                return state['value']
+            with lock:
+                if not is_fresh():
+                    state['value'] = f()
+                    state['t'] = time.monotonic()
+                return state['value']
+
+        def invalidate():
+            state['t'] = 0.0
+
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
+
+
+@cache_for(1.5)
 def get_container_status():
     """Get the status of the PZ container."""
-    result = subprocess.run(
-        ['docker', 'ps', '-a', '--filter', f'name={CONTAINER_NAME}', '--format', '{{.Status}}'],
-        capture_output=True,
-        text=True
-    )
+    try:
+        container = inspect_container()
+    except OSError:
+        container = False  # Docker socket not reachable; ask the CLI
+
+    if container is None:
+        return 'not found'
+    if container:
+        return 'running' if container['State'].get('Running') else 'stopped'
+
+    result = run_docker(['docker', 'ps', '-a', '--filter', f'name={CONTAINER_NAME}', '--format', '{{.Status}}'])
     status = result.stdout.strip()
     if not status:
         return 'not found'
@@ -257,22 +730,352 @@ def get_container_status():
     return 'stopped'
 
 
-def get_container_stats():
-    """Get CPU/Memory usage of the container."""
-    result = subprocess.run(
-        ['docker', 'stats', CONTAINER_NAME, '--no-stream', '--format', '{{.CPUPerc}},{{.MemUsage}}'],
-        capture_output=True,
+STATS_FORMAT = '{{.CPUPerc}},{{.MemUsage}}'
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+_latest_stats = {'value': None}
+_stats_lock = threading.Lock()
+_stats_updated = threading.Condition(_stats_lock)
+_stats_thread = None
+
+
+def parse_stats_line(line):
+    """Parse a 'cpu,memory' line from docker stats output."""
+    parts = ANSI_ESCAPE_RE.sub('', line).strip().split(',')
+    if not parts[0]:
+        return None
+    return {
+        'cpu': parts[0] if len(parts) > 0 else 'N/A',
+        'memory': parts[1] if len(parts) > 1 else 'N/A'
+    }
+
+
+def parse_api_stats(data):
+    """Turn a Docker API stats sample into docker stats style CPU/Memory strings."""
+    cpu_stats = data.get('cpu_stats', {})
+    precpu_stats = data.get('precpu_stats', {})
+    memory_stats = data.get('memory_stats', {})
+    if not memory_stats.get('usage'):
+        return None  # Container isn't running
+
+    cpu_delta = cpu_stats.get('cpu_usage', {}).get('total_usage', 0) - precpu_stats.get('cpu_usage', {}).get('total_usage', 0)
+    system_delta = cpu_stats.get('system_cpu_usage', 0) - precpu_stats.get('system_cpu_usage', 0)
+    online_cpus = cpu_stats.get('online_cpus') or len(cpu_stats.get('cpu_usage', {}).get('percpu_usage') or []) or 1
+    cpu = cpu_delta / system_delta * online_cpus * 100 if system_delta > 0 and cpu_delta > 0 else 0.0
+
+    # Like docker stats, don't count reclaimable page cache as used memory
+    page_cache = memory_stats.get('stats', {})
+    page_cache = page_cache.get('inactive_file', page_cache.get('total_inactive_file', 0))
+    memory = memory_stats['usage'] - min(page_cache, memory_stats['usage'])
+    return {
+        'cpu': f'{cpu:.2f}%',
+        'memory': f'{format_bytes(memory)} / {format_bytes(memory_stats.get("limit", 0))}'
+    }
+
+
+def follow_stats_api():
+    """Yield samples from the Docker API's streaming stats endpoint."""
+    conn = DockerConnection(timeout=None)
+    try:
+        conn.request('GET', f'/containers/{quote(CONTAINER_NAME)}/stats?stream=true')
+        response = conn.getresponse()
+        if response.status != 200:
+            return
+        for line in response:
+            yield parse_api_stats(orjson.loads(line))
+    finally:
+        conn.close()
+
+
+def follow_stats_cli():
+    """Yield samples from a long-lived docker stats CLI process."""
+    proc = subprocess.Popen(
+        ['docker', 'stats', CONTAINER_NAME, '--format', STATS_FORMAT],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
         text=True
     )
+    try:
+        for line in proc.stdout:
+            yield parse_stats_line(line)
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def stream_container_stats():
+    """Follow a long-lived docker stats stream, keeping only the latest sample."""
+    while True:
+        try:
+            samples = follow_stats_api() if os.path.exists(DOCKER_SOCKET) else follow_stats_cli()
+            for stats in samples:
+                if stats is not None:
+                    with _stats_lock:
+                        if stats != _latest_stats['value']:
+                            _latest_stats['value'] = stats
+                            _stats_updated.notify_all()
+        except (OSError, ValueError, http.client.HTTPException):
+            pass
+
+        # Stream ended (container removed or recreated); respawn it shortly
+        with _stats_lock:
+            _latest_stats['value'] = None
+        time.sleep(5)
+
+
+def start_stats_stream():
+    """Start the background stats reader once per process."""
+    global _stats_thread
+    with _stats_lock:
+        if _stats_thread is None:
+            _stats_thread = threading.Thread(target=stream_container_stats, daemon=True)
+            _stats_thread.start()
+
+
+@cache_for(3)
+def sample_container_stats():
+    """Take a one-off stats sample, used until the stream has produced one."""
+    try:
+        status, body = docker_api('GET', f'/containers/{quote(CONTAINER_NAME)}/stats?stream=false')
+        if status == 200:
+            return parse_api_stats(orjson.loads(body)) or {'cpu': 'N/A', 'memory': 'N/A'}
+        return {'cpu': 'N/A', 'memory': 'N/A'}
+    except OSError:
+        pass  # Docker socket not reachable; ask the CLI
+
+    result = run_docker(['docker', 'stats', CONTAINER_NAME, '--no-stream', '--format', STATS_FORMAT])
     if result.returncode == 0 and result.stdout.strip():
-        parts = result.stdout.strip().split(',')
-        return {
-            'cpu': parts[0] if len(parts) > 0 else 'N/A',
-            'memory': parts[1] if len(parts) > 1 else 'N/A'
-        }
+        return parse_stats_line(result.stdout) or {'cpu': 'N/A', 'memory': 'N/A'}
     return {'cpu': 'N/A', 'memory': 'N/A'}
 
 
+_cgroup = {'path': None, 'checked': 0.0, 'sample': None, 'stats': None}
+_cgroup_lock = threading.Lock()
+
+
+def find_container_cgroup():
+    """Locate the container's cgroup v2 directory for the systemd or cgroupfs driver."""
+    try:
+        container = inspect_container()
+        container_id = container['Id'] if container else None
+    except OSError:
+        result = run_docker(['docker', 'inspect', '--format', '{{.Id}}', CONTAINER_NAME])
+        container_id = result.stdout.strip() if result.returncode == 0 else None
+    if not container_id:
+        return None
+    for path in (
+        os.path.join(CGROUP_ROOT, 'system.slice', f'docker-{container_id}.scope'),
+        os.path.join(CGROUP_ROOT, 'docker', container_id)
+    ):
+        if os.path.exists(os.path.join(path, 'cpu.stat')):
+            return path
+    return None
+
+
+def format_bytes(size):
+    """Format a byte count the way docker stats does (e.g. 1.5GiB)."""
+    units = ['B', 'KiB', 'MiB', 'GiB', 'TiB']
+    i = 0
+    while size >= 1024 and i < len(units) - 1:
+        size /= 1024
+        i += 1
+    return f'{size:.4g}{units[i]}'
+
+
+def read_cgroup_file(path, name):
+    with open(os.path.join(path, name), 'r') as f:
+        return f.read()
+
+
+def read_cpu_usage(path):
+    """Return total CPU time used by the cgroup, in microseconds."""
+    for line in read_cgroup_file(path, 'cpu.stat').splitlines():
+        key, value = line.split()
+        if key == 'usage_usec':
+            return int(value)
+    raise ValueError('usage_usec missing from cpu.stat')
+
+
+def read_cgroup_stats():
+    """Read CPU/Memory usage straight from the container's cgroup, or None if unavailable."""
+    with _cgroup_lock:
+        now = time.monotonic()
+        path = _cgroup['path']
+        if path is None:
+            # Not found (no cgroup v2 mount, or container missing); retry occasionally
+            if now - _cgroup['checked'] < 30:
+                return None
+            _cgroup['checked'] = now
+            path = _cgroup['path'] = find_container_cgroup()
+            if path is None:
+                return None
+
+        if _cgroup['stats'] is not None and now - _cgroup['sample'][0] < 1:
+            return _cgroup['stats']
+
+        try:
+            usage = read_cpu_usage(path)
+            if _cgroup['sample'] is None or usage < _cgroup['sample'][1]:
+                # First read, or the counter restarted along with the container's
+                # cgroup (e.g. after a restart); measure against a fresh baseline
+                _cgroup['sample'] = (now, usage)
+                time.sleep(0.1)
+                now = time.monotonic()
+                usage = read_cpu_usage(path)
+
+            # Like docker stats, don't count reclaimable page cache as used memory
+            memory = int(read_cgroup_file(path, 'memory.current'))
+            for line in read_cgroup_file(path, 'memory.stat').splitlines():
+                key, value = line.split()
+                if key == 'inactive_file':
+                    memory -= min(int(value), memory)
+                    break
+            limit = read_cgroup_file(path, 'memory.max').strip()
+            if limit == 'max':
+                limit = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        except (OSError, ValueError):
+            # Container was removed or recreated under a new ID
+            _cgroup.update(path=None, sample=None, stats=None)
+            return None
+
+        then, previous = _cgroup['sample']
+        cpu = (usage - previous) / ((now - then) * 1e6) * 100
+        _cgroup['sample'] = (now, usage)
+        _cgroup['stats'] = {
+            'cpu': f'{cpu:.2f}%',
+            'memory': f'{format_bytes(memory)} / {format_bytes(int(limit))}'
+        }
+        return _cgroup['stats']
+
+
+def get_container_stats():
+    """Get CPU/Memory usage of the container."""
+    stats = read_cgroup_stats()
+    if stats is not None:
+        return stats
+
+    # No cgroup access; fall back to docker stats
+    start_stats_stream()
+    with _stats_lock:
+        stats = _latest_stats['value']
+    return stats if stats is not None else sample_container_stats()
+
+
+# Recent container log lines, kept current by one long-lived follower so /api/logs
+# doesn't have to spawn docker logs (and reread the log file) on every poll
+LOG_BUFFER_LINES = 10000
+LOG_IDLE_TIMEOUT = 60  # Stop following once nobody has asked for logs in this long
+_log_lines = deque(maxlen=LOG_BUFFER_LINES)
+_log_lock = threading.Lock()
+_log_state = {'live': False, 'read_at': 0.0}
+_log_thread = None
+
+
+def follow_logs_api():
+    """Yield text from the Docker API's follow logs endpoint, minus the stream headers."""
+    query = urlencode({'follow': 1, 'tail': LOG_BUFFER_LINES, 'stdout': 1, 'stderr': 1})
+    conn = DockerConnection(timeout=None)
+    try:
+        conn.request('GET', f'/containers/{quote(CONTAINER_NAME)}/logs?{query}')
+        response = conn.getresponse()
+        if response.status != 200:
+            return
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        header = response.read(8)
+        if not (len(header) == 8 and header[0] in (0, 1, 2) and header[1:4] == b'\0\0\0'):
+            # Containers with a TTY send raw, unframed output
+            yield decoder.decode(header)
+            for chunk in iter(lambda: response.read1(65536), b''):
+                yield decoder.decode(chunk)
+            return
+        while len(header) == 8:
+            yield decoder.decode(response.read(int.from_bytes(header[4:8], 'big')))
+            header = response.read(8)
+    finally:
+        conn.close()
+
+
+def follow_logs_cli():
+    """Yield lines from a long-lived docker logs -f CLI process."""
+    proc = subprocess.Popen(
+        ['docker', 'logs', '-f', '--tail', str(LOG_BUFFER_LINES), CONTAINER_NAME],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors='replace'
+    )
+    try:
+        yield from proc.stdout
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def stream_container_logs():
+    """Follow the container's logs into the ring buffer while someone is reading them."""
+    global _log_thread
+    delay = 5
+    while True:
+        with _log_lock:
+            if time.monotonic() - _log_state['read_at'] > LOG_IDLE_TIMEOUT:
+                # No readers; the next /api/logs request starts us again
+                _log_state['live'] = False
+                _log_thread = None
+                return
+
+        if get_container_status() != 'running':
+            # Following a stopped container returns at once; back off rather than
+            # rereading its whole tail every few seconds
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+            continue
+        delay = 5
+
+        chunks = follow_logs_api() if os.path.exists(DOCKER_SOCKET) else follow_logs_cli()
+        try:
+            pending = ''
+            for text in chunks:
+                lines = (pending + text).splitlines(keepends=True)
+                pending = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+                with _log_lock:
+                    if not _log_state['live']:
+                        # The follower replays the tail first, so start from a clean buffer
+                        _log_lines.clear()
+                        _log_state['live'] = True
+                    _log_lines.extend(lines)
+                    if time.monotonic() - _log_state['read_at'] > LOG_IDLE_TIMEOUT:
+                        break
+        except (OSError, ValueError, http.client.HTTPException):
+            pass
+        finally:
+            chunks.close()
+
+        # Container stopped or was recreated; serve logs per request until we're back
+        with _log_lock:
+            _log_state['live'] = False
+        time.sleep(5)
+
+
+def start_log_stream():
+    """Start the background log follower once per process."""
+    global _log_thread
+    with _log_lock:
+        if _log_thread is None:
+            _log_thread = threading.Thread(target=stream_container_logs, daemon=True)
+            _log_thread.start()
+
+
+def get_buffered_logs(lines):
+    """Return the last lines from the ring buffer, or None if it can't answer."""
+    with _log_lock:
+        _log_state['read_at'] = time.monotonic()
+    start_log_stream()
+    with _log_lock:
+        if not _log_state['live'] or (lines > len(_log_lines) and len(_log_lines) == LOG_BUFFER_LINES):
+            return None
+        return ''.join(list(_log_lines)[-lines:]) if lines else ''
+
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -295,15 +1098,53 @@ def index():
     return render_template('index.html')
 
 
-@app.route('/api/status')
-@login_required
-def api_status():
+def get_server_state():
+    """Get the container status with its current CPU/Memory usage."""
     status = get_container_status()
     stats = get_container_stats() if status == 'running' else {'cpu': 'N/A', 'memory': 'N/A'}
-    return jsonify({
+    return {
         'status': status,
         'cpu': stats['cpu'],
         'memory': stats['memory']
+    }
+
+
+@app.route('/api/status')
+@login_required
+def api_status():
+    # Tag the state so a poll that finds nothing changed gets an empty 304
+    body = orjson.dumps(get_server_state())
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.blake2b(body, digest_size=8).hexdigest())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/api/status/stream')
+@login_required
+def api_status_stream():
+    """Push server state to the browser as Server-Sent Events whenever it changes."""
+    def events():
+        last = None
+        last_sent = 0.0
+        while True:
+            state = get_server_state()
+            if state != last:
+                last = state
+                last_sent = time.monotonic()
+                yield b'data: ' + orjson.dumps(state) + b'\n\n'
+            elif time.monotonic() - last_sent >= 15:
+                # Keep-alive comment so proxies don't drop the idle connection
+                last_sent = time.monotonic()
+                yield b': keep-alive\n\n'
+
+            # Wake on a new stats sample, or recheck the status every few seconds
+            with _stats_updated:
+                _stats_updated.wait(timeout=5)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 
@@ -311,20 +1152,30 @@ def api_status():
 @login_required
 def api_logs():
     lines = request.args.get('lines', '100')
-    result = subprocess.run(
-        ['docker', 'logs', CONTAINER_NAME, '--tail', lines],
-        capture_output=True,
-        text=True
-    )
-    # Combine stdout and stderr (game logs go to stderr)
-    output = result.stdout + result.stderr
-    return jsonify({'logs': output})
+    if lines.isdigit():
+        logs = get_buffered_logs(int(lines))
+        if logs is not None:
+            return jsonify({'logs': logs})
+
+    # Include both stdout and stderr (game logs go to stderr)
+    query = urlencode({'tail': lines, 'stdout': 1, 'stderr': 1})
+    try:
+        status, body = docker_api('GET', f'/containers/{quote(CONTAINER_NAME)}/logs?{query}')
+    except OSError:
+        # Docker socket not reachable; fall back to the CLI
+        result = run_docker(['docker', 'logs', CONTAINER_NAME, '--tail', lines])
+        return jsonify({'logs': result.stdout + result.stderr})
+
+    if status != 200:
+        return jsonify({'logs': orjson.loads(body).get('message', '') if body else ''})
+    return jsonify({'logs': demux_docker_logs(body)})
 
 
 @app.route('/api/start', methods=['POST'])
 @login_required
 def api_start():
     result = run_docker_command(['docker-compose', '-f', 'docker-compose.yml', 'up', '-d'])
+    get_container_status.invalidate()
     return jsonify(result)
 
 
@@ -332,26 +1183,82 @@ def api_start():
 @login_required
 def api_stop():
     result = run_docker_command(['docker-compose', '-f', 'docker-compose.yml', 'down'])
+    get_container_status.invalidate()
     return jsonify(result)
 
 
 @app.route('/api/restart', methods=['POST'])
 @login_required
 def api_restart():
-    result = run_docker_command(['docker-compose', '-f', 'docker-compose.yml', 'restart'])
+    # Restart in place through the Docker API (30s grace period, as in the compose file)
+    try:
+        status, body = docker_api(
+            'POST', f'/containers/{quote(CONTAINER_NAME)}/restart?t=30', timeout=30 + COMPOSE_TIMEOUT
+        )
+        if status == 204:
+            result = {'success': True, 'output': f'Restarted {CONTAINER_NAME}'}
+        else:
+            result = {'success': False, 'output': orjson.loads(body).get('message', '') if body else f'HTTP {status}'}
+    except OSError:
+        result = run_docker_command(['docker-compose', '-f', 'docker-compose.yml', 'restart'])
+    get_container_status.invalidate()
     return jsonify(result)
 
 
+def set_backup_job(job_id, status, output):
+    """Record a backup job's state; stored in SQLite so every worker can report it."""
+    db = connect_db()
+    db.execute(
+        'INSERT OR REPLACE INTO backup_jobs (id, status, output) VALUES (?, ?, ?)',
+        (job_id, status, output)
+    )
+    db.commit()
+    db.close()
+
+
+def clone_tree(source_path, target_path):
+    """Copy a world folder, as a copy-on-write reflink where the filesystem supports it."""
+    import shutil
+
+    # Claim the target first: fails if it already exists, so we never copy into
+    # (or clean up) a folder this call didn't create
+    os.mkdir(target_path)
+    try:
+        # cp --reflink=auto shares extents on btrfs/XFS and quietly falls back to a
+        # normal copy elsewhere; -T copies the folder's contents onto target_path
+        # rather than nesting it inside
+        try:
+            result = subprocess.run(
+                ['cp', '-a', '-T', '--reflink=auto', source_path, target_path],
+                capture_output=True,
+                text=True
+            )
+        except FileNotFoundError:
+            shutil.copytree(source_path, target_path, symlinks=True, dirs_exist_ok=True)
+            return
+        if result.returncode != 0:
+            raise OSError(result.stderr.strip() or 'Copy failed')
+    except BaseException:
+        shutil.rmtree(target_path, ignore_errors=True)
+        raise
+
+
+def run_backup(job_id, source_path, backup_path, backup_name):
+    """Copy a world folder in the background, recording the outcome on the job."""
+    try:
+        clone_tree(source_path, backup_path)
+        set_backup_job(job_id, 'done', f'Backup created: {backup_name}')
+    except Exception as e:
+        set_backup_job(job_id, 'error', str(e))
+
+
 @app.route('/api/backup', methods=['POST'])
 @login_required
 def api_backup():
-    """Create a backup of the current world in Saves/Multiplayer."""
+    """Start a backup of the current world in Saves/Multiplayer."""
     import datetime
-    import shutil
 
-    # Get current world name
-    env = read_env_file()
-    current_world = env.get('SERVER_NAME', 'servertest')
+    current_world = get_current_world()
 
     # Create backup name with timestamp
     timestamp = datetime.datetime.now().strftime('%d-%m-%y_%H-%M-%S')
@@ -365,39 +1272,93 @@ def api_backup():
     if not os.path.exists(source_path):
         return jsonify({'success': False, 'output': f'World "{current_world}" not found. Start the server first to create it.'})
 
+    # Backup names only have one-second resolution
+    if os.path.lexists(backup_path):
+        return jsonify({'success': False, 'output': f'Backup "{backup_name}" already exists. Try again in a moment.'})
+
+    # Large worlds take minutes to copy, so do it off the request thread
+    job_id = uuid.uuid4().hex
     try:
-        shutil.copytree(source_path, backup_path)
-        return jsonify({'success': True, 'output': f'Backup created: {backup_name}'})
+        set_backup_job(job_id, 'running', f'Creating backup: {backup_name}')
+        threading.Thread(
+            target=run_backup,
+            args=(job_id, source_path, backup_path, backup_name),
+            daemon=True
+        ).start()
+        return jsonify({'success': True, 'job_id': job_id, 'output': f'Creating backup: {backup_name}'})
     except Exception as e:
         return jsonify({'success': False, 'output': str(e)})
 
 
+@app.route('/api/backup/<job_id>')
+@login_required
+def api_backup_status(job_id):
+    """Get the state of a backup started by /api/backup."""
+    row = get_db().execute(
+        'SELECT status, output FROM backup_jobs WHERE id = ?', (job_id,)
+    ).fetchone()
+    if row is None:
+        return jsonify({'success': False, 'status': 'error', 'output': 'Backup job not found'})
+    return jsonify({
+        'success': row['status'] != 'error',
+        'status': row['status'],
+        'output': row['output']
+    })
+
+
+def steam_response(payload, stale):
+    """JSON response for Steam lookups, flagged when served from a stale cache entry."""
+    response = jsonify(payload)
+    if stale:
+        response.headers['X-Cache'] = 'stale'
+    return response
+
+
 @app.route('/api/workshop/<workshop_id>')
 @login_required
 def api_workshop_lookup(workshop_id):
     """Lookup mod info from Steam Workshop."""
-    return jsonify(fetch_workshop_info(workshop_id))
+    info = fetch_workshop_info(workshop_id)
+    return steam_response(info, info.get('stale'))
+
+
+@app.route('/api/workshop', methods=['POST'])
+@login_required
+def api_workshop_batch_lookup():
+    """Lookup info for several mods from Steam Workshop in one call."""
+    data = request.json
+    workshop_ids = [str(w).strip() for w in data.get('workshop_ids', []) if str(w).strip()]
+    results = fetch_workshop_info_batch(workshop_ids)
+    return steam_response(results, any(info.get('stale') for info in results.values()))
 
 
 @app.route('/api/collection/<collection_id>')
 @login_required
 def api_collection_lookup(collection_id):
     """Lookup collection info and items from Steam Workshop."""
-    # First get collection metadata
-    info = fetch_workshop_info(collection_id)
+    # Get collection items, then the collection and its mods' metadata in one call
+    items = fetch_collection_items(collection_id)
+    item_ids = items['items'] if items.get('success') else []
+    details = fetch_workshop_info_batch([collection_id] + item_ids)
+
+    info = details[collection_id]
+    stale = items.get('stale') or any(info.get('stale') for info in details.values())
     if not info.get('success'):
-        return jsonify(info)
+        return steam_response(info, stale)
 
-    # Then get collection items
-    items = fetch_collection_items(collection_id)
     if items.get('success'):
         info['is_collection'] = True
-        info['collection_items'] = items['items']
+        info['collection_items'] = item_ids
         info['collection_count'] = items['count']
+        info['collection_mods'] = {
+            workshop_id: details[workshop_id]
+            for workshop_id in item_ids
+            if details[workshop_id].get('success')
+        }
     else:
         info['is_collection'] = False
 
-    return jsonify(info)
+    return steam_response(info, stale)
 
 
 @app.route('/api/mods/import-collection', methods=['POST'])
@@ -420,25 +1381,34 @@ def api_import_collection():
         return jsonify({'success': False, 'output': 'Collection is empty'})
 
     current = get_mods()
+    existing = set(current['workshop_items'])
     added_count = 0
 
     # Add each workshop item if not already present
     for workshop_id in item_ids:
-        if workshop_id not in current['workshop_items']:
+        if workshop_id not in existing:
+            existing.add(workshop_id)
             current['workshop_items'].append(workshop_id)
             added_count += 1
 
     try:
         save_mods(current['workshop_items'], current['mods'])
-        return jsonify({
-            'success': True,
-            'output': f'Added {added_count} mods from collection ({len(item_ids)} total, {len(item_ids) - added_count} already existed)',
-            'added': added_count,
-            'total': len(item_ids)
-        })
     except Exception as e:
         return jsonify({'success': False, 'output': str(e)})
 
+    # Pass along whatever details are already cached; the page batch-fetches the rest
+    # itself, so the import doesn't wait on Steam or spend rate limit for titles
+    cached = _workshop_cache.get_many(item_ids)
+    return jsonify({
+        'success': True,
+        'output': f'Added {added_count} mods from collection ({len(item_ids)} total, {len(item_ids) - added_count} already existed)',
+        'added': added_count,
+        'total': len(item_ids),
+        'collection_mods': {
+            workshop_id: info for workshop_id, (info, _) in cached.items() if info.get('success')
+        }
+    })
+
 
 @app.route('/api/mods')
 @login_required
@@ -517,45 +1487,46 @@ def api_remove_mod():
 SERVER_DATA_DIR = os.path.join(COMPOSE_DIR, 'server-data')
 SAVES_DIR = os.path.join(SERVER_DATA_DIR, 'Saves', 'Multiplayer')
 
+# PZ creates backups with patterns like: servername_backup, servername_01-01-24_12-00-00
+BACKUP_FOLDER_RE = re.compile(r'_backup|_\d{2}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}$', re.IGNORECASE)
+WORLD_NAME_RE = re.compile(r'^[a-zA-Z0-9_-]+$')
+
 
 def is_backup_folder(name):
     """Check if a folder name indicates it's a backup."""
-    # PZ creates backups with patterns like: servername_backup, servername_01-01-24_12-00-00
-    if '_backup' in name.lower():
-        return True
-    # Check for timestamp pattern (date-time suffix)
-    if re.search(r'_\d{2}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}$', name):
-        return True
-    return False
+    # Either a '_backup' marker or a date-time suffix
+    return BACKUP_FOLDER_RE.search(name) is not None
 
 
 def get_current_world():
-    """Get current SERVER_NAME from .env file."""
-    env = read_env_file()
-    return env.get('SERVER_NAME', 'servertest')
+    """Get current SERVER_NAME from settings."""
+    return get_setting('SERVER_NAME') or 'servertest'
 
 
 def get_available_worlds():
     """List available save folders, separating worlds from backups."""
     worlds = []
     backups = []
-    if os.path.exists(SAVES_DIR):
-        for name in os.listdir(SAVES_DIR):
-            world_path = os.path.join(SAVES_DIR, name)
-            if os.path.isdir(world_path):
+    try:
+        # scandir entries carry the file type from the directory read, saving a stat per folder
+        with os.scandir(SAVES_DIR) as it:
+            for dir_entry in it:
+                if not dir_entry.is_dir():
+                    continue
                 try:
-                    stat = os.stat(world_path)
                     entry = {
-                        'name': name,
-                        'modified': stat.st_mtime
+                        'name': dir_entry.name,
+                        'modified': dir_entry.stat().st_mtime
                     }
                 except OSError:
-                    entry = {'name': name, 'modified': 0}
+                    entry = {'name': dir_entry.name, 'modified': 0}
 
-                if is_backup_folder(name):
+                if is_backup_folder(dir_entry.name):
                     backups.append(entry)
                 else:
                     worlds.append(entry)
+    except FileNotFoundError:
+        pass
 
     # Sort by last modified (newest first)
     worlds.sort(key=lambda x: x['modified'], reverse=True)
@@ -587,13 +1558,11 @@ def api_switch_world():
         return jsonify({'success': False, 'output': 'World name is required'})
 
     # Validate world name (alphanumeric, underscore, hyphen only)
-    if not re.match(r'^[a-zA-Z0-9_-]+$', world_name):
+    if not WORLD_NAME_RE.match(world_name):
         return jsonify({'success': False, 'output': 'Invalid world name. Use only letters, numbers, underscore and hyphen.'})
 
     try:
-        env = read_env_file()
-        env['SERVER_NAME'] = world_name
-        write_env_file(env)
+        set_setting('SERVER_NAME', world_name)
         return jsonify({
             'success': True,
             'output': f'Switched to world: {world_name}. Restart server to apply.'
@@ -613,19 +1582,15 @@ def api_create_world():
         return jsonify({'success': False, 'output': 'World name is required'})
 
     # Validate world name
-    if not re.match(r'^[a-zA-Z0-9_-]+$', world_name):
+    if not WORLD_NAME_RE.match(world_name):
         return jsonify({'success': False, 'output': 'Invalid world name. Use only letters, numbers, underscore and hyphen.'})
 
-    # Check if world already exists
-    worlds, backups = get_available_worlds()
-    all_names = [w['name'] for w in worlds] + [b['name'] for b in backups]
-    if world_name in all_names:
+    # Check if world already exists (world and backup folders share SAVES_DIR)
+    if os.path.lexists(os.path.join(SAVES_DIR, world_name)):
         return jsonify({'success': False, 'output': 'A world with this name already exists'})
 
     try:
-        env = read_env_file()
-        env['SERVER_NAME'] = world_name
-        write_env_file(env)
+        set_setting('SERVER_NAME', world_name)
         return jsonify({
             'success': True,
             'output': f'World "{world_name}" will be created on next server start. Restart the server to begin.'
@@ -638,8 +1603,6 @@ def api_create_world():
 @login_required
 def api_restore_backup():
     """Restore a world from a backup folder."""
-    import shutil
-
     data = request.json
     backup_name = data.get('backup_name', '').strip()
     target_name = data.get('target_name', '').strip()
@@ -651,7 +1614,7 @@ def api_restore_backup():
         return jsonify({'success': False, 'output': 'Target world name is required'})
 
     # Validate target name
-    if not re.match(r'^[a-zA-Z0-9_-]+$', target_name):
+    if not WORLD_NAME_RE.match(target_name):
         return jsonify({'success': False, 'output': 'Invalid target name. Use only letters, numbers, underscore and hyphen.'})
 
     backup_path = os.path.join(SAVES_DIR, backup_name)
@@ -662,17 +1625,15 @@ def api_restore_backup():
         return jsonify({'success': False, 'output': 'Backup not found'})
 
     # Check target doesn't exist (unless it's the same as current world)
-    if os.path.exists(target_path):
+    if os.path.lexists(target_path):
         return jsonify({'success': False, 'output': f'World "{target_name}" already exists. Choose a different name or delete it first.'})
 
     try:
         # Copy backup to target
-        shutil.copytree(backup_path, target_path)
+        clone_tree(backup_path, target_path)
 
         # Switch to the restored world
-        env = read_env_file()
-        env['SERVER_NAME'] = target_name
-        write_env_file(env)
+        set_setting('SERVER_NAME', target_name)
 
         return jsonify({
             'success': True,
@@ -683,4 +1644,6 @@ def api_restore_backup():
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    # Local runs only; the image serves the app with gunicorn + gevent (see Dockerfile).
+    # Thread per request so a slow compose or Steam call doesn't block the other requests
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)